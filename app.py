@@ -1,11 +1,13 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from collections import deque
+from functools import lru_cache
 import calendar
+import math
+import queue
+import threading
 import streamlit as st
-from streamlit.components.v1 import html
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 
 # --- Google Sheets Integration ---
 SCOPE = [
@@ -13,126 +15,304 @@ SCOPE = [
     "https://www.googleapis.com/auth/drive"
 ]
 SPREADSHEET_NAME = "TradingHistory"
+SHEET_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'  # How trade timestamps are written to the sheet
+WIN_RATE_WINDOW = 5  # Trades considered for the rolling win rate and the prediction
+TRADING_STATE_DTYPE = pd.CategoricalDtype(['Good', 'Neutral', 'Bad'])
+TRADE_DTYPES = {
+    'Win/Lose': 'int8',
+    'Winning Streak': 'int16',
+    'Losing Streak': 'int16',
+    'WinRate': 'float32',
+    'Trading State': TRADING_STATE_DTYPE
+}
+CHART_MAX_POINTS = 500  # Upper bound on points sent to the win rate chart
+TRADE_COLUMNS = [
+    'Date', 'Win/Lose', 'Gain',
+    'Winning Streak', 'Losing Streak',
+    'WinRate', 'Trading State'
+]
 
 
+# Authorized once and shared across reruns; exceptions are not cached
+@st.cache_resource(show_spinner=False)
 def get_gsheet_client():
+    # Imported lazily: the auth/crypto stack loads only when a client is first authorized
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    creds_dict = {
+        "type": "service_account",
+        "project_id": st.secrets["google_credentials"]["project_id"],
+        "private_key_id": st.secrets["google_credentials"]["private_key_id"],
+        "private_key": st.secrets["google_credentials"]["private_key"].replace('\\n', '\n'),
+        "client_email": st.secrets["google_credentials"]["client_email"],
+        "client_id": st.secrets["google_credentials"]["client_id"],
+        "auth_uri": st.secrets["google_credentials"]["auth_uri"],
+        "token_uri": st.secrets["google_credentials"]["token_uri"],
+        "auth_provider_x509_cert_url": st.secrets["google_credentials"]["auth_provider_x509_cert_url"],
+        "client_x509_cert_url": st.secrets["google_credentials"]["client_x509_cert_url"],
+        "universe_domain": st.secrets["google_credentials"]["universe_domain"]
+    }
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
+    return gspread.authorize(creds)
+
+
+# Opening the spreadsheet costs a metadata request, so the handle is kept too
+@st.cache_resource(show_spinner=False)
+def _get_sheet():
+    return get_gsheet_client().open(SPREADSHEET_NAME).sheet1
+
+
+def get_trade_sheet():
     try:
-        creds_dict = {
-            "type": "service_account",
-            "project_id": st.secrets["google_credentials"]["project_id"],
-            "private_key_id": st.secrets["google_credentials"]["private_key_id"],
-            "private_key": st.secrets["google_credentials"]["private_key"].replace('\\n', '\n'),
-            "client_email": st.secrets["google_credentials"]["client_email"],
-            "client_id": st.secrets["google_credentials"]["client_id"],
-            "auth_uri": st.secrets["google_credentials"]["auth_uri"],
-            "token_uri": st.secrets["google_credentials"]["token_uri"],
-            "auth_provider_x509_cert_url": st.secrets["google_credentials"]["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": st.secrets["google_credentials"]["client_x509_cert_url"],
-            "universe_domain": st.secrets["google_credentials"]["universe_domain"]
-        }
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
-        client = gspread.authorize(creds)
-        return client
+        return _get_sheet()
     except Exception as e:
         st.error(f"Google Sheets connection error: {str(e)}")
         return None
 
 
-def save_trade_to_sheet(trade_data):
-    client = get_gsheet_client()
-    if client:
+def _is_auth_error(error):
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) in (401, 403)
+
+
+# A single daemon thread drains queued rows, so sheet writes stay ordered and
+# never block the script thread
+class SheetWriter:
+    def __init__(self):
+        self.writes = queue.Queue()
+        # Also taken around sheet reads, so the gspread client is used by one thread at a time
+        self.lock = threading.Lock()
+        self.held = []  # Failed writes, retried ahead of anything queued after them
+        self.carried = []  # Handed over by a replaced writer, not attempted yet
+        self.successor = None
+
+        # A cleared cache entry or an edited _sheet_writer leaves the old thread
+        # running; it hands its writes over here before this thread drains anything
+        self.predecessors = []
+        for thread in threading.enumerate():
+            previous = getattr(thread, 'sheet_writer', None)
+            if previous is not None and previous.successor is None:
+                with previous.lock:
+                    previous.successor = self
+                    self.held += previous.held
+                    self.carried += previous.carried
+                    previous.held, previous.carried = [], []
+                previous.writes.put(None)  # Wake it up to hand over
+                self.predecessors.append(thread)
+
+        thread = threading.Thread(target=self._drain, daemon=True)
+        thread.sheet_writer = self
+        thread.start()
+
+    def put(self, write):
+        # A replaced writer passes the write on instead of stranding it
+        with self.lock:
+            if self.successor is None:
+                self.writes.put(write)
+                return
+        self.successor.put(write)
+
+    def _drain(self):
+        for thread in self.predecessors:
+            thread.join()
+
+        while True:
+            # Whatever queued up during the previous request goes out as one batch
+            batch = [self.writes.get()]
+            while True:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [write for write in batch if write is not None]
+
+            with self.lock:
+                if self.successor is not None:
+                    # put() forwards from now on, so whatever is queued here is the last of it
+                    while True:
+                        try:
+                            batch.append(self.writes.get_nowait())
+                        except queue.Empty:
+                            break
+                    self.successor.carried += [write for write in batch if write is not None]
+                    return
+
+                batch = self.carried + batch
+                self.carried = []
+                rows = [row for _, write_rows, _ in self.held + batch for row in write_rows]
+                if not rows:
+                    continue
+                # The newest handle wins, so a re-authorized sheet also retries held rows
+                sheet = (self.held + batch)[-1][0]
+                try:
+                    _append_rows_to_sheet(sheet, rows)
+                except Exception as e:
+                    # Each session hears about its own rows (or its empty retry) once
+                    for _, write_rows, results in batch:
+                        results.put((len(write_rows), e))
+                    self.held += [write for write in batch if write[1]]
+                else:
+                    for _, write_rows, results in self.held:
+                        results.put((-len(write_rows), None))
+                    self.held = []
+
+
+@st.cache_resource(show_spinner=False)
+def _sheet_writer():
+    return SheetWriter()
+
+
+def _append_rows_to_sheet(sheet, rows):
+    # One values.append call for the whole batch; RAW skips server-side parsing and
+    # INSERT_ROWS inserts new rows instead of overwriting whatever follows the table
+    sheet.append_rows(rows, value_input_option='RAW', insert_data_option='INSERT_ROWS')
+    _load_trade_history_cached.clear()
+
+
+def queue_sheet_write(rows):
+    sheet = get_trade_sheet()
+    if sheet:
+        _sheet_writer().put((sheet, rows, st.session_state.sync_results))
+        return True
+    return False
+
+
+def flush_pending_sync():
+    # Queued even when empty, so the writer retries any rows it is holding
+    if queue_sheet_write(st.session_state.pending_sync):
+        st.session_state.pending_sync = []
+
+
+def collect_sync_results():
+    results = st.session_state.sync_results
+    while True:
         try:
-            sheet = client.open(SPREADSHEET_NAME).sheet1
-            sheet.append_row(trade_data)
-        except Exception as e:
-            st.error(f"Failed to save trade: {str(e)}")
+            held_change, error = results.get_nowait()
+        except queue.Empty:
+            break
+        # Rows the writer is holding for a retry, as opposed to never queued
+        st.session_state.held_sync_count += held_change
+        if error is None:
+            continue
+        # A rejected token will not heal on its own; drop the cached client
+        if _is_auth_error(error):
+            get_gsheet_client.clear()
+            _get_sheet.clear()
+        st.error(f"Failed to save trade: {str(error)}")
+
+
+# Shared by new sessions for up to a minute (and until the next write); errors
+# propagate and are not cached
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_trade_history_cached():
+    sheet = _get_sheet()
+    with _sheet_writer().lock:
+        data = sheet.get_all_records()
+
+    required_columns = {
+        'Date': pd.NaT,
+        'Win/Lose': 0,
+        'Gain': 0.0,
+        'Winning Streak': 0,
+        'Losing Streak': 0,
+        'WinRate': 0.0,
+        'Trading State': 'Neutral'
+    }
+
+    df = pd.DataFrame(data).rename(columns={
+        'Gains': 'Gain',
+        'Winning Streaks': 'Winning Streak',
+        'LoosingStreaks': 'Losing Streak',
+        'Loosing Streak': 'Losing Streak'
+    })
+
+    for col, default in required_columns.items():
+        if col not in df.columns:
+            df[col] = default
+
+    # An explicit format skips per-row inference; strings that don't match (e.g. written
+    # before RAW appends, with the sheet's own date formatting) fall back to inference.
+    # gspread hands numeric-looking cells over as numbers, which are left as NaT
+    raw_dates = df['Date']
+    dates = pd.to_datetime(raw_dates, format=SHEET_DATE_FORMAT, errors='coerce', cache=True)
+    unparsed = dates.isna() & raw_dates.map(lambda v: isinstance(v, str) and v != '').astype(bool)
+    if unparsed.any():
+        # fillna rather than a masked assignment: the two parses may differ in resolution
+        dates = dates.fillna(pd.to_datetime(raw_dates.where(unparsed), errors='coerce'))
+    df['Date'] = dates
+    df['Win/Lose'] = df['Win/Lose'].astype('int8')
+    states = df['Trading State']
+    df['Trading State'] = states.where(
+        states.isin(TRADING_STATE_DTYPE.categories), 'Neutral').astype(TRADING_STATE_DTYPE)
+
+    # Derived columns are cached with the rows, so unchanged history is never recomputed
+    if not df.empty:
+        df = calculate_streaks(calculate_win_rate(df))
+    return df
 
 
 def load_trade_history_from_sheet():
     try:
-        client = get_gsheet_client()
-        if not client:
-            return pd.DataFrame()
-
-        sheet = client.open(SPREADSHEET_NAME).sheet1
-        data = sheet.get_all_records()
-
-        required_columns = {
-            'Date': pd.NaT,
-            'Win/Lose': 0,
-            'Gain': 0.0,
-            'Winning Streak': 0,
-            'Losing Streak': 0,
-            'WinRate': 0.0,
-            'Trading State': 'Neutral'
-        }
-
-        df = pd.DataFrame(data).rename(columns={
-            'Gains': 'Gain',
-            'Winning Streaks': 'Winning Streak',
-            'LoosingStreaks': 'Losing Streak',
-            'Loosing Streak': 'Losing Streak'
-        })
-
-        for col, default in required_columns.items():
-            if col not in df.columns:
-                df[col] = default
-
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df['Win/Lose'] = df['Win/Lose'].astype(int)
-        df['Trading State'] = df['Trading State'].fillna('Neutral')
-
-        return df
+        return _load_trade_history_cached()
     except Exception as e:
         st.error(f"Error loading trade history: {str(e)}")
         return pd.DataFrame()
 
 
 # --- Core Logic ---
+def get_trades_df():
+    # trades_df is the source of truth; only trades saved since the last rerun are
+    # turned into a frame and appended, so the history is never rebuilt from dicts
+    df = st.session_state.trades_df
+    new_trades = st.session_state.new_trades
+    if new_trades:
+        tail = pd.DataFrame.from_records(new_trades, columns=TRADE_COLUMNS).astype(TRADE_DTYPES)
+        df = pd.concat([df, tail], ignore_index=True) if not df.empty else tail
+        st.session_state.trades_df = df
+        st.session_state.new_trades = []
+    return df
+
+
 def calculate_streaks(df):
     if df.empty:
         return df
 
-    df['Win/Lose'] = df['Win/Lose'].astype(int)
-    current_win, current_loss = 0, 0
-    win_streaks, loss_streaks = [], []
+    outcomes = df['Win/Lose'].to_numpy(dtype=np.int8)
 
-    for outcome in df['Win/Lose']:
-        if outcome == 1:
-            current_win += 1
-            current_loss = 0
-        else:
-            current_loss += 1
-            current_win = 0
-        win_streaks.append(current_win)
-        loss_streaks.append(current_loss)
+    # Position within each run of identical outcomes: index minus the run's start index
+    positions = np.arange(len(outcomes))
+    run_starts = np.empty(len(outcomes), dtype=bool)
+    run_starts[0] = True
+    run_starts[1:] = outcomes[1:] != outcomes[:-1]
+    run_length = positions - np.maximum.accumulate(np.where(run_starts, positions, 0)) + 1
 
-    df['Winning Streak'] = win_streaks
-    df['Losing Streak'] = loss_streaks
+    df['Winning Streak'] = np.where(outcomes == 1, run_length, 0).astype(np.int16)
+    df['Losing Streak'] = np.where(outcomes == 0, run_length, 0).astype(np.int16)
     return df
 
 
-def calculate_win_rate(df, window=5):  # Now using 5-trade window
+def calculate_win_rate(df, window=WIN_RATE_WINDOW):
     if df.empty:
         return df
 
-    df['WinRate'] = (df['Win/Lose']
-                     .rolling(window, min_periods=1)
-                     .mean()
-                     .fillna(0.5) * 100)
-    return df
+    # Window sums as differences of a prefix sum; early rows average what is available
+    outcomes = df['Win/Lose'].to_numpy(dtype=np.int32)
+    prefix = np.concatenate(([0], np.cumsum(outcomes)))
+    ends = np.arange(1, len(outcomes) + 1)
+    starts = np.maximum(ends - window, 0)
 
+    df['WinRate'] = ((prefix[ends] - prefix[starts]) * 100 / (ends - starts)).astype(np.float32)
+    return df
 
-def predict_state(df):
-    if df.empty:
-        return 'Neutral', 0.65
 
-    # Strictly consider last 5 trades
-    last_5 = df['Win/Lose'].tail(5)
-    if len(last_5) < 5:
+@lru_cache(maxsize=256)
+def predict_state(trade_count, wins):
+    # Strictly consider the last WIN_RATE_WINDOW trades
+    if trade_count < WIN_RATE_WINDOW:
         return 'Neutral', 0.65
 
-    win_rate = last_5.mean() * 100
+    win_rate = wins / trade_count * 100
 
     if win_rate > 50:
         return 'Good', 0.90
@@ -141,13 +321,126 @@ def predict_state(df):
     return 'Neutral', 0.65
 
 
+# --- Trading Journal ---
+# Indexed by TRADING_STATE_DTYPE category code; the last entry doubles as code -1 (missing)
+JOURNAL_ROW_CSS = np.array([
+    'background-color: #4CAF5020',  # Good
+    'background-color: #FFA50020',  # Neutral
+    'background-color: #FF525220',  # Bad
+    'background-color: #FFA50020'   # missing
+])
+
+
+def journal_row_css(df):
+    # One vectorized lookup for the whole column, broadcast across every cell of the row
+    css = JOURNAL_ROW_CSS[df['Trading State'].cat.codes.to_numpy()]
+    return pd.DataFrame(np.broadcast_to(css[:, None], df.shape), index=df.index, columns=df.columns)
+
+
+def build_styled_journal(df):
+    display_df = df.copy()
+    display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d %H:%M')
+
+    return display_df.style.apply(journal_row_css, axis=None).format({
+        'Gain': '${:.2f}',
+        'WinRate': '{:.1f}%'
+    })
+
+
+def get_styled_journal(df):
+    # Reused across reruns until a trade is added, like get_trades_df
+    cached = st.session_state.get('journal_styler')
+    if cached is None or cached[0] != len(df):
+        cached = (len(df), build_styled_journal(df))
+        st.session_state.journal_styler = cached
+    return cached[1]
+
+
+# --- Dashboard Rendering ---
+PREDICTION_STYLES = {
+    'Good': ('#4CAF50', '🚀', 'Great Job! Keep it up!'),
+    'Neutral': ('#FFA500', '⚡', 'Stay Alert!'),
+    'Bad': ('#FF5252', '⚠️', 'Review Your Strategy!')
+}
+METRIC_VALUE_HTML = "<h1 style='color: {color}; text-align: center;'>{value}</h1>"
+
+
+@lru_cache(maxsize=16)
+def prediction_card_html(prediction, confidence):
+    # Only a handful of (state, confidence) pairs exist, so the HTML is built once each
+    color, icon, message = PREDICTION_STYLES[prediction]
+    confidence_percent = confidence * 100
+
+    return f"""
+    <div style="background-color: {color}20;
+                padding: 20px;
+                border-radius: 10px;
+                border-left: 5px solid {color};
+                margin: 10px 0;">
+        <div style="display: flex; align-items: center;">
+            <div style="font-size: 40px; margin-right: 20px;">
+                {icon}
+            </div>
+            <div>
+                <h2 style="color: {color}; margin: 0;">
+                    {prediction} State - {message}
+                </h2>
+                <p style="margin: 5px 0;">Confidence Level: {confidence_percent:.0f}%</p>
+                <div style="background-color: #e0e0e0; border-radius: 5px; height: 10px;">
+                    <div style="background-color: {color}; 
+                                width: {confidence_percent}%; 
+                                height: 10px; 
+                                border-radius: 5px;">
+                    </div>
+                </div>
+            </div>
+        </div>
+    </div>
+    """
+
+
 # --- Calendar Visualization ---
+# Each week is emitted as one flex row instead of seven column widgets
+CALENDAR_ROW_HTML = '<div style="display: flex; gap: 1rem; margin-bottom: 1rem;">{}</div>'
+CALENDAR_CELL_HTML = '<div style="flex: 1; min-width: 0;">{}</div>'
+CALENDAR_TRADE_DAY_HTML = (
+    '<div style="border: 1px solid #e0e0e0; border-radius: 5px; padding: 5px; '
+    'text-align: center; background-color: {color}30; min-height: 80px; '
+    'transition: all 0.2s ease;">'
+    '<div style="font-weight: bold; color: {color};">{day}</div>'
+    '<div style="font-size: 0.8em;">'
+    '<span style="color: #4CAF50;">▲{wins}</span> '
+    '<span style="color: #FF5252;">▼{losses}</span>'
+    '</div>'
+    '</div>'
+)
+CALENDAR_QUIET_DAY_HTML = (
+    '<div style="color: #666; text-align: center; padding: 5px; min-height: 80px;">{day}</div>'
+)
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+@lru_cache(maxsize=64)
+def month_weeks(year, month):
+    return tuple(tuple(week) for week in calendar.Calendar().monthdayscalendar(year, month))
+
+
 def create_trade_calendar(df, selected_date):
-    df['Date'] = pd.to_datetime(df['Date'])
-    daily_trades = df.groupby(df['Date'].dt.date).agg(
-        Total_Trades=('Win/Lose', 'count'),
-        Net_Wins=('Win/Lose', 'sum')
-    ).reset_index()
+    if df['Date'].dtype.kind != 'M':
+        df = df.assign(Date=pd.to_datetime(df['Date'], errors='coerce'))
+    # Group on day-truncated datetime64 keys rather than Python date objects
+    days = df['Date'].to_numpy().astype('datetime64[D]')
+    outcomes_by_day = pd.DataFrame({
+        'Day': days,
+        'Win/Lose': df['Win/Lose'].to_numpy()
+    }).groupby('Day', sort=False)['Win/Lose']
+    daily_trades = pd.DataFrame({
+        'Total_Trades': outcomes_by_day.size(),
+        'Net_Wins': outcomes_by_day.sum()
+    })
+    # Index once so each calendar cell is a dict lookup rather than a DataFrame scan
+    day_lookup = dict(zip(daily_trades.index.date,
+                          zip(daily_trades['Total_Trades'], daily_trades['Net_Wins'])))
 
     month = selected_date.month
     year = selected_date.year
@@ -167,57 +460,34 @@ def create_trade_calendar(df, selected_date):
             st.session_state.calendar_date = selected_date
 
     # Calendar grid
-    cal = calendar.Calendar()
-    weeks = cal.monthdayscalendar(year, month)
-    day_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    weeks = month_weeks(year, month)
 
     # Header
-    cols = st.columns(7)
-    for i, day in enumerate(day_names):
-        cols[i].markdown(f"**{day}**", unsafe_allow_html=True)
+    header = ''.join(CALENDAR_CELL_HTML.format(f"<b>{day}</b>") for day in DAY_NAMES)
+    st.markdown(CALENDAR_ROW_HTML.format(header), unsafe_allow_html=True)
 
     # Body
     for week in weeks:
-        cols = st.columns(7)
-        for i, day in enumerate(week):
+        cells = []
+        for day in week:
             if day == 0:
-                cols[i].write(" ")
+                cells.append(CALENDAR_CELL_HTML.format(""))
                 continue
 
             current_date = datetime(year, month, day).date()
-            daily_data = daily_trades[daily_trades['Date'] == current_date]
+            day_stats = day_lookup.get(current_date)
 
-            if not daily_data.empty:
-                total = daily_data['Total_Trades'].values[0]
-                wins = daily_data['Net_Wins'].values[0]
+            if day_stats is not None:
+                total, wins = day_stats
                 losses = total - wins
 
                 color = "#4CAF50" if wins > losses else "#FF5252" if losses > wins else "#FFA500"
-                html_content = f"""
-                <div style="border: 1px solid #e0e0e0; 
-                            border-radius: 5px; 
-                            padding: 5px; 
-                            text-align: center;
-                            background-color: {color}30;
-                            min-height: 80px;
-                            transition: all 0.2s ease;">
-                    <div style="font-weight: bold; color: {color};">{day}</div>
-                    <div style="font-size: 0.8em;">
-                        <span style="color: #4CAF50;">▲{wins}</span>
-                        <span style="color: #FF5252;">▼{losses}</span>
-                    </div>
-                </div>
-                """
-                cols[i].markdown(html_content, unsafe_allow_html=True)
+                cell_html = CALENDAR_TRADE_DAY_HTML.format(color=color, day=day, wins=wins, losses=losses)
             else:
-                cols[i].markdown(f"""
-                <div style="color: #666; 
-                            text-align: center; 
-                            padding: 5px;
-                            min-height: 80px;">
-                    {day}
-                </div>
-                """, unsafe_allow_html=True)
+                cell_html = CALENDAR_QUIET_DAY_HTML.format(day=day)
+            cells.append(CALENDAR_CELL_HTML.format(cell_html))
+
+        st.markdown(CALENDAR_ROW_HTML.format(''.join(cells)), unsafe_allow_html=True)
 
 
 # --- Main App ---
@@ -228,17 +498,35 @@ def main():
     if 'calendar_date' not in st.session_state:
         st.session_state.calendar_date = datetime.now().date()
 
-    if 'trades' not in st.session_state:
+    if 'pending_sync' not in st.session_state:
+        st.session_state.pending_sync = []
+        # The writer thread reports back here, per session
+        st.session_state.sync_results = queue.Queue()
+        st.session_state.held_sync_count = 0
+
+    collect_sync_results()
+
+    if 'trades_df' not in st.session_state:
         df = load_trade_history_from_sheet()
-        if not df.empty:
-            df = calculate_streaks(calculate_win_rate(df))
+        st.session_state.trades_df = (df if not df.empty
+                                      else pd.DataFrame(columns=TRADE_COLUMNS)).astype(TRADE_DTYPES)
+        st.session_state.new_trades = []
+
+        # Running counters so a new trade only updates the tail, not the history
+        if df.empty:
+            st.session_state.win_streak = 0
+            st.session_state.loss_streak = 0
+            recent = []
         else:
-            df = pd.DataFrame(columns=[
-                'Date', 'Win/Lose', 'Gain',
-                'Winning Streak', 'Losing Streak',
-                'WinRate', 'Trading State'
-            ])
-        st.session_state.trades = df
+            st.session_state.win_streak = int(df['Winning Streak'].iat[-1])
+            st.session_state.loss_streak = int(df['Losing Streak'].iat[-1])
+            recent = df['Win/Lose'].tail(WIN_RATE_WINDOW).astype(int)
+        st.session_state.recent_outcomes = deque(recent, maxlen=WIN_RATE_WINDOW)
+        st.session_state.recent_wins = int(sum(st.session_state.recent_outcomes))
+
+    trades = get_trades_df()
+    prediction, confidence = predict_state(len(st.session_state.recent_outcomes),
+                                           st.session_state.recent_wins)
 
     # --- Trade Input Form ---
     with st.expander("➕ New Trade Entry", expanded=True):
@@ -251,131 +539,111 @@ def main():
                 gain = st.number_input("Gain/Loss ($)", value=0.0, step=0.01)
 
             if st.form_submit_button("💾 Save Trade"):
+                if win_lose == 1:
+                    st.session_state.win_streak += 1
+                    st.session_state.loss_streak = 0
+                else:
+                    st.session_state.loss_streak += 1
+                    st.session_state.win_streak = 0
+
+                # Running sum over the window: add the new outcome, drop the evicted one
+                recent = st.session_state.recent_outcomes
+                if len(recent) == recent.maxlen:
+                    st.session_state.recent_wins -= recent[0]
+                recent.append(win_lose)
+                st.session_state.recent_wins += win_lose
+                trade_state, _ = predict_state(len(recent), st.session_state.recent_wins)
+
                 new_trade = {
                     'Date': datetime.now(),
                     'Win/Lose': win_lose,
                     'Gain': gain,
-                    'Winning Streak': 0,
-                    'Losing Streak': 0,
-                    'WinRate': 0.0,
-                    'Trading State': 'Neutral'
+                    'Winning Streak': st.session_state.win_streak,
+                    'Losing Streak': st.session_state.loss_streak,
+                    'WinRate': st.session_state.recent_wins / len(recent) * 100,
+                    'Trading State': trade_state
                 }
 
-                updated_df = pd.concat([
-                    st.session_state.trades,
-                    pd.DataFrame([new_trade])
-                ], ignore_index=True)
-
-                updated_df = calculate_streaks(calculate_win_rate(updated_df))
-                prediction, _ = predict_state(updated_df)
-                updated_df.at[updated_df.index[-1], 'Trading State'] = prediction
-
                 # Prepare data for Google Sheets
-                new_row = updated_df.iloc[-1]
                 trade_data = [
-                    new_row['Date'].strftime('%Y-%m-%d %H:%M:%S'),
-                    int(new_row['Win/Lose']),
-                    float(new_row['Gain']),
-                    int(new_row['Winning Streak']),
-                    int(new_row['Losing Streak']),
-                    float(new_row['WinRate']),
-                    str(new_row['Trading State'])
+                    new_trade['Date'].strftime(SHEET_DATE_FORMAT),
+                    int(new_trade['Win/Lose']),
+                    float(new_trade['Gain']),
+                    int(new_trade['Winning Streak']),
+                    int(new_trade['Losing Streak']),
+                    float(new_trade['WinRate']),
+                    str(new_trade['Trading State'])
                 ]
 
-                st.session_state.trades = updated_df
-                save_trade_to_sheet(trade_data)
+                st.session_state.new_trades.append(new_trade)
+                # Rows still waiting to sync must reach the sheet before this one
+                if st.session_state.pending_sync:
+                    st.session_state.pending_sync.append(trade_data)
+                    flush_pending_sync()
+                elif not queue_sheet_write([trade_data]):
+                    st.session_state.pending_sync.append(trade_data)
                 st.balloons()
                 st.rerun()
 
+        pending_count = len(st.session_state.pending_sync) + st.session_state.held_sync_count
+        if pending_count:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.caption(f"⏳ {pending_count} trade(s) waiting to sync with Google Sheets")
+            with col2:
+                if st.button("🔄 Sync Now"):
+                    flush_pending_sync()
+                    st.rerun()
+
     # --- Dashboard ---
-    if not st.session_state.trades.empty:
-        latest = st.session_state.trades.iloc[-1]
-        prediction, confidence = predict_state(st.session_state.trades)
+    if not trades.empty:
+        # Read the latest scalars directly rather than building a row Series
+        latest_win_rate = trades['WinRate'].iat[-1]
+        latest_win_streak = trades['Winning Streak'].iat[-1]
+        latest_loss_streak = trades['Losing Streak'].iat[-1]
 
         # Prediction Display
-        prediction_color = {
-            'Good': ('#4CAF50', '🚀', 'Great Job! Keep it up!'),
-            'Neutral': ('#FFA500', '⚡', 'Stay Alert!'),
-            'Bad': ('#FF5252', '⚠️', 'Review Your Strategy!')
-        }[prediction]
-
-        confidence_percent = confidence * 100
-
-        st.markdown(f"""
-        <div style="background-color: {prediction_color[0]}20;
-                    padding: 20px;
-                    border-radius: 10px;
-                    border-left: 5px solid {prediction_color[0]};
-                    margin: 10px 0;">
-            <div style="display: flex; align-items: center;">
-                <div style="font-size: 40px; margin-right: 20px;">
-                    {prediction_color[1]}
-                </div>
-                <div>
-                    <h2 style="color: {prediction_color[0]}; margin: 0;">
-                        {prediction} State - {prediction_color[2]}
-                    </h2>
-                    <p style="margin: 5px 0;">Confidence Level: {confidence_percent:.0f}%</p>
-                    <div style="background-color: #e0e0e0; border-radius: 5px; height: 10px;">
-                        <div style="background-color: {prediction_color[0]}; 
-                                    width: {confidence_percent}%; 
-                                    height: 10px; 
-                                    border-radius: 5px;">
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(prediction_card_html(prediction, confidence), unsafe_allow_html=True)
 
         # Metrics
         cols = st.columns(4)
         with cols[0]:
             st.markdown("### 📊 Current Win Rate")
-            st.markdown(f"<h1 style='color: #4CAF50; text-align: center;'>{latest['WinRate']:.1f}%</h1>",
+            st.markdown(METRIC_VALUE_HTML.format(color='#4CAF50', value=f"{latest_win_rate:.1f}%"),
                         unsafe_allow_html=True)
         with cols[1]:
             st.markdown("### 🔥 Winning Streak")
-            st.markdown(f"<h1 style='color: #4CAF50; text-align: center;'>{latest['Winning Streak']}</h1>",
+            st.markdown(METRIC_VALUE_HTML.format(color='#4CAF50', value=latest_win_streak),
                         unsafe_allow_html=True)
         with cols[2]:
             st.markdown("### 💔 Losing Streak")
-            st.markdown(f"<h1 style='color: #FF5252; text-align: center;'>{latest['Losing Streak']}</h1>",
+            st.markdown(METRIC_VALUE_HTML.format(color='#FF5252', value=latest_loss_streak),
                         unsafe_allow_html=True)
         with cols[3]:
             st.markdown("### 💰 Total Gain/Loss")
-            total_gain = st.session_state.trades['Gain'].sum()
+            total_gain = trades['Gain'].sum()
             color = "#4CAF50" if total_gain >= 0 else "#FF5252"
-            st.markdown(f"<h1 style='color: {color}; text-align: center;'>${total_gain:.2f}</h1>",
+            st.markdown(METRIC_VALUE_HTML.format(color=color, value=f"${total_gain:.2f}"),
                         unsafe_allow_html=True)
 
         # Historical Data
         st.subheader("📒 Trading Journal")
-        display_df = st.session_state.trades.copy()
-        display_df['Date'] = display_df['Date'].dt.strftime('%Y-%m-%d %H:%M')
-
-        styled_df = display_df.style.apply(
-            lambda x: [f'background-color: #4CAF5020' if x['Trading State'] == 'Good' else
-                       f'background-color: #FF525220' if x['Trading State'] == 'Bad' else
-                       f'background-color: #FFA50020' for _ in x],
-            axis=1
-        ).format({
-            'Gain': '${:.2f}',
-            'WinRate': '{:.1f}%'
-        })
-
+        styled_df = get_styled_journal(trades)
         st.dataframe(styled_df, use_container_width=True, height=400)
 
         # Win Rate Chart
         st.subheader("📈 Win Rate Trend")
-        st.line_chart(st.session_state.trades.set_index('Date')['WinRate'])
+        win_rate = trades.set_index('Date')['WinRate']
+        # Decimate long histories, striding back from the latest trade so it is always plotted
+        step = math.ceil(len(win_rate) / CHART_MAX_POINTS)
+        st.line_chart(win_rate.iloc[::-step].iloc[::-1])
 
     else:
         st.info("🌟 No trades recorded yet. Make your first trade above!")
 
     # --- Trading Calendar ---
     st.markdown("---")
-    create_trade_calendar(st.session_state.trades, st.session_state.calendar_date)
+    create_trade_calendar(trades, st.session_state.calendar_date)
 
 
 if __name__ == "__main__":